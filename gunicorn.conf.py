@@ -0,0 +1,22 @@
+"""
+gunicorn settings for YouTube Downloader, picked up by `gunicorn wsgi:app`
+
+Download status, progress streams and the info cache are kept in memory
+in the app process, so the app must run in exactly one worker process.
+Concurrency comes from threads instead.
+"""
+
+bind = "localhost:5000"
+workers = 1
+worker_class = "gthread"
+# Each open progress stream holds a thread for the length of its download
+threads = 16
+
+def nworkers_changed(server, new_value, old_value):
+    """Refuse extra workers, also after a reload or TTIN; they would not see each other's downloads"""
+    # 0 is how gunicorn stops the last worker on shutdown, so only clamp upwards
+    if new_value > 1:
+        server.log.warning("YouTube Downloader keeps state in memory; using 1 worker instead of %d",
+                           new_value)
+        # Re-enters this hook with new_value 1, which leaves it alone
+        server.num_workers = 1
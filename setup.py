@@ -6,66 +6,277 @@ Setup script for YouTube Downloader
 Run this first to set up everything automatically
 """
 
-import subprocess
+import argparse
+import functools
+import hashlib
+import importlib
+import importlib.metadata
+import importlib.util
 import sys
 import os
 from pathlib import Path
 
+# Distribution name -> importable module name
+REQUIRED_PACKAGES = {"flask": "flask", "yt-dlp": "yt_dlp"}
+DOWNLOAD_DIR = os.path.join(os.getcwd(), "youtubestuff")
+DOWNLOAD_SUBDIRS = tuple(os.path.join(DOWNLOAD_DIR, sub) for sub in ("audio", "video"))
+PIP_CACHE_DIR = Path.home() / ".cache" / "youloader-pip"
+LOCK_FILE = Path(__file__).resolve().parent / "requirements.lock"
+BUNDLE_FILE = Path(__file__).resolve().parent / "youloader.pyz"
+
+# Plain ASCII markers for consoles that cannot encode the emoji (e.g. cp1252)
+_UTF = (sys.stdout.encoding or "").lower().startswith("utf")
+OK = "✓" if _UTF else "OK"
+BAD = "❌" if _UTF else "ERR"
+WARN = "⚠️ " if _UTF else "!"
+DONE = "✅" if _UTF else "OK"
+TITLE = "🎥 " if _UTF else ""
+
+_FFMPEG_MISSING_MSG = (
+    f"{WARN} ffmpeg not found\n",
+    "For full functionality, please install ffmpeg:\n",
+    "  Windows: Download from https://ffmpeg.org/download.html\n",
+    "  macOS: brew install ffmpeg\n",
+    "  Linux: sudo apt install ffmpeg (Ubuntu/Debian)\n",
+)
+SETUP_STAMP = Path.cwd() / ".setup_ok"
+
+# PATH is split once; Windows only needs the handful of executable suffixes
+_PATH_DIRS = [d for d in os.environ.get("PATH", "").split(os.pathsep) if d]
+_EXE_SUFFIXES = ("", ".exe", ".cmd", ".bat") if os.name == "nt" else ("",)
+
+@functools.cache
+def _path_index():
+    """Map file names on PATH to their locations in PATH order, listing each directory once"""
+    index = {}
+    for directory in _PATH_DIRS:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    name = entry.name.lower() if os.name == "nt" else entry.name
+                    index.setdefault(name, []).append(entry.path)
+        except OSError:
+            continue
+    return index
+
+def _find_exe(name):
+    """Return the full path of an executable on PATH, or None"""
+    index = _path_index()
+    for suffix in _EXE_SUFFIXES:
+        # Only the few candidates for this name are checked; folders and
+        # non-executables fall through to the next one on PATH
+        for path in index.get(name + suffix, ()):
+            if os.path.isfile(path) and os.access(path, os.X_OK):
+                return path
+    return None
+
+def missing_packages():
+    """Return the required packages that are not installed yet"""
+    # find_spec answers from the import system's own caches, no metadata scan
+    return [
+        package for package, module in REQUIRED_PACKAGES.items()
+        if importlib.util.find_spec(module) is None
+    ]
+
+def locked_versions():
+    """Return the versions pinned in the lock file, keyed by package name"""
+    versions = {}
+    try:
+        lines = LOCK_FILE.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return versions
+    for line in lines:
+        name, sep, version = line.split("#", 1)[0].strip().partition("==")
+        if sep:
+            versions[name.strip().lower()] = version.strip()
+    return versions
+
+def setup_fingerprint():
+    """Hash the interpreter and package versions, or None if a package is missing"""
+    importlib.invalidate_caches()
+    try:
+        versions = [importlib.metadata.version(p) for p in REQUIRED_PACKAGES]
+    except importlib.metadata.PackageNotFoundError:
+        return None
+    key = "|".join([sys.version, *versions])
+    return hashlib.blake2b(key.encode()).hexdigest()
+
+def is_already_set_up():
+    """Check whether a previous setup run finished for this exact environment"""
+    fingerprint = setup_fingerprint()
+    try:
+        return fingerprint is not None and SETUP_STAMP.read_text() == fingerprint
+    except OSError:
+        return False
+
+def run_quiet(cmd):
+    """Run a command with its output captured, showing it only if the command fails"""
+    import subprocess
+    # Status lines printed so far must come out before any error output
+    sys.stdout.flush()
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode:
+        sys.stderr.write(result.stdout + result.stderr)
+        raise subprocess.CalledProcessError(result.returncode, cmd)
+
+def run_pip(pip_args):
+    """Run pip in this interpreter when possible, raising CalledProcessError on failure"""
+    import subprocess
+    sys.stdout.flush()
+    try:
+        # Reuse this interpreter instead of paying for a second startup
+        from pip._internal.cli.main import main as pip_main
+    except ImportError:
+        run_quiet([sys.executable, "-m", "pip", *pip_args])
+        return
+    returncode = pip_main(pip_args)
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, ["pip", *pip_args])
+
+def pip_install(args):
+    """Run pip install with the shared cache and non-interactive settings"""
+    import subprocess
+    uv = _find_exe("uv")
+    if uv:
+        # uv is a much faster drop-in for pip install and keeps its own cache
+        print("Using uv to install packages")
+        run_quiet([uv, "pip", "install", "--quiet", "--python", sys.executable, *args])
+        return
+
+    PIP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    pip_args = [
+        "install",
+        "--disable-pip-version-check",
+        "--no-input",
+        # No progress bars or per-package chatter; errors are still reported
+        "--quiet",
+        "--no-color",
+        "--progress-bar=off",
+        "--cache-dir", str(PIP_CACHE_DIR),
+        *args
+    ]
+    try:
+        # Wheels only: never fall into a slow source build on the first try
+        run_pip([*pip_args, "--only-binary=:all:"])
+    except subprocess.CalledProcessError:
+        print(f"{WARN} No wheels for every package, retrying with source builds allowed...")
+        run_pip([*pip_args, "--prefer-binary"])
+
 def install_requirements():
     """Install required Python packages"""
-    print("Installing Python requirements...")
+    import subprocess
+    missing = missing_packages()
+    if not missing:
+        print(f"{OK} Python packages already installed")
+        return True
+
+    print(f"Installing Python requirements: {', '.join(missing)}...")
     try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "flask", "yt-dlp"])
-        print("✓ Python packages installed successfully")
+        specs = missing
+        # The lock pins every dependency, so only use it for a fresh install;
+        # otherwise it would replace versions the user already has
+        if LOCK_FILE.exists() and len(missing) == len(REQUIRED_PACKAGES):
+            try:
+                # The lock file is already fully resolved, so skip pip's resolver
+                pip_install(["--no-deps", "-r", str(LOCK_FILE)])
+                print(f"{OK} Python packages installed successfully")
+                return True
+            except subprocess.CalledProcessError:
+                print(f"{WARN} Locked install failed, resolving dependencies with pip...")
+        else:
+            # Add just the missing packages, at the versions the lock was tested with
+            locked = locked_versions()
+            specs = [f"{p}=={locked[p]}" if p in locked else p for p in missing]
+        pip_install(specs)
+        print(f"{OK} Python packages installed successfully")
     except subprocess.CalledProcessError as e:
-        print(f"❌ Failed to install Python packages: {e}")
+        print(f"{BAD} Failed to install Python packages: {e}")
         return False
     return True
 
+@functools.cache
 def check_ffmpeg():
     """Check if ffmpeg is installed"""
-    import shutil
-    if shutil.which("ffmpeg"):
-        print("✓ ffmpeg is available")
+    if _find_exe("ffmpeg"):
+        print(f"{OK} ffmpeg is available")
         return True
     else:
-        print("⚠️  ffmpeg not found")
-        print("For full functionality, please install ffmpeg:")
-        print("  Windows: Download from https://ffmpeg.org/download.html")
-        print("  macOS: brew install ffmpeg")
-        print("  Linux: sudo apt install ffmpeg (Ubuntu/Debian)")
+        sys.stdout.writelines(_FFMPEG_MISSING_MSG)
         return False
 
 def create_directories():
     """Create necessary directories"""
-    base_dir = Path.cwd() / "youtubestuff"
-    audio_dir = base_dir / "audio"
-    video_dir = base_dir / "video"
-    
-    base_dir.mkdir(exist_ok=True)
-    audio_dir.mkdir(exist_ok=True)
-    video_dir.mkdir(exist_ok=True)
-    
-    print(f"✓ Created directories: {base_dir}")
+    # makedirs creates DOWNLOAD_DIR along with the first subfolder; the isdir
+    # check is a cached stat, cheaper than a mkdir that fails with EEXIST
+    for sub_dir in DOWNLOAD_SUBDIRS:
+        if not os.path.isdir(sub_dir):
+            os.makedirs(sub_dir, exist_ok=True)
+
+    print(f"{OK} Created directories: {DOWNLOAD_DIR}")
 
-def main():
-    print("🎥 YouTube Downloader Setup")
+def probe_environment():
+    """Run the cheap package, ffmpeg and directory probes concurrently"""
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        packages = executor.submit(lambda: not missing_packages())
+        ffmpeg = executor.submit(check_ffmpeg)
+        directories = executor.submit(
+            lambda: all(os.path.isdir(d) for d in DOWNLOAD_SUBDIRS)
+        )
+        return packages.result(), ffmpeg.result(), directories.result()
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Set up YouTube Downloader")
+    parser.add_argument("--offline", action="store_true",
+                        help="do not touch the network; skip installing Python packages")
+    parser.add_argument("--skip-deps", action="store_true",
+                        help="skip installing Python packages")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"{TITLE}YouTube Downloader Setup")
     print("=" * 40)
     
+    if is_already_set_up():
+        print(f"{OK} Already set up, nothing to do")
+        return
+    
+    packages_ok, ffmpeg_ok, directories_ok = probe_environment()
+    
     # Install requirements
-    if not install_requirements():
+    if BUNDLE_FILE.exists():
+        print(f"{OK} Using bundled dependencies from {BUNDLE_FILE.name}")
+    elif packages_ok:
+        print(f"{OK} Python packages already installed")
+    elif args.offline or args.skip_deps:
+        print(f"{WARN} Skipping Python package installation")
+    elif not install_requirements():
         print("Setup failed. Please install requirements manually.")
         return
     
-    # Check ffmpeg
-    check_ffmpeg()
-    
     # Create directories
-    create_directories()
+    if directories_ok:
+        print(f"{OK} Directories already exist: {DOWNLOAD_DIR}")
+    else:
+        create_directories()
     
-    print("\n✅ Setup complete!")
-    print("Run 'python app.py' to start the application")
+    # Only remember a complete setup so the ffmpeg warning keeps showing
+    fingerprint = setup_fingerprint()
+    if ffmpeg_ok and fingerprint:
+        SETUP_STAMP.write_text(fingerprint)
+    
+    print(f"\n{DONE} Setup complete!")
+    if BUNDLE_FILE.exists():
+        print(f"Run 'python {BUNDLE_FILE.name}' to start the application")
+    else:
+        print("Run 'python app.py' to start the application")
     print("Then open http://localhost:5000 in your browser")
 
 if __name__ == "__main__":
+    # Batch the status lines instead of flushing each one on a terminal;
+    # pip_install flushes before pip starts writing its own output
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=False)
     main()
@@ -0,0 +1,9 @@
+"""
+WSGI entry point for running YouTube Downloader under a production server
+
+    gunicorn wsgi:app
+
+Server settings live in gunicorn.conf.py.
+"""
+
+from youtube_downloader import app
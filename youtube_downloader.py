@@ -4,15 +4,41 @@ YouTube Video Downloader - Local Application
 A simple web-based YouTube downloader using yt-dlp
 """
 
+import asyncio
+import gzip
+import hashlib
+import importlib.util
 import os
+import queue
+import site
 import sys
 import json
+import tempfile
 import subprocess
 import shutil
 import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Future
 from pathlib import Path
-from flask import Flask, render_template_string, request, jsonify, send_from_directory
+from urllib.parse import urlsplit
+from flask import Flask, Response, request, jsonify, send_from_directory
+
+try:
+    # RE2 guarantees linear-time matching on untrusted URLs and yt-dlp output
+    import re2 as re
+except ImportError:
+    import re
+
+try:
+    # orjson handles the multi-megabyte raw info JSON several times faster
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    json_loads = json.loads
+    def json_dumps(obj):
+        return json.dumps(obj).encode("utf-8")
 
 app = Flask(__name__)
 
@@ -21,118 +47,530 @@ BASE_DIR = Path.cwd()
 DOWNLOAD_DIR = BASE_DIR / "youtubestuff"
 AUDIO_DIR = DOWNLOAD_DIR / "audio"
 VIDEO_DIR = DOWNLOAD_DIR / "video"
+META_CACHE_DIR = DOWNLOAD_DIR / ".meta_cache"
+META_CACHE_TTL = 60 * 60
+# Files are only swept this long after they stop being used, so a download
+# that just picked a file still finds it when yt-dlp starts
+META_CACHE_SWEEP_GRACE = 10 * 60
+MAX_BATCH_URLS = 50
+# "Best Quality" filter thresholds; YouTube's top audio tiers are 128-160 kbps
+BEST_VIDEO_HEIGHT = 720
+BEST_AUDIO_ABR = 128
+# Smaller JSON answers are sent as-is; gzip would barely shrink them
+MIN_COMPRESS_SIZE = 512
+DEPS_CACHE_FILE = Path.home() / ".youloader" / "deps.json"
+# Downloads past this many wait their turn instead of splitting the bandwidth
+MAX_CONCURRENT_DOWNLOADS = max(1, int(os.environ.get("YOULOADER_CONCURRENCY", "4")))
+
+# Fetch DASH/HLS fragments in parallel and plain files in large ranges
+DOWNLOAD_TUNING_ARGS = [
+    "--concurrent-fragments", "8",
+    "--http-chunk-size", "10M",
+    "--buffer-size", "16K",
+]
+
+# yt-dlp takes full URLs, URLs without a scheme and bare video IDs; what
+# must never reach its command line is an option ("-...") or whitespace
+# and control characters
+URL_RE = re.compile(r"^[^\s\x00-\x1f\x7f-][^\s\x00-\x1f\x7f]*$")
+URL_SCHEME_RE = re.compile(r"^([A-Za-z][A-Za-z0-9+.-]*)://")
+BARE_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+VIDEO_ID_RE = re.compile(r"(?:[?&]v=|youtu\.be/|/shorts/)([A-Za-z0-9_-]{11})(?:$|[^A-Za-z0-9_-])")
+# Bytes pattern: yt-dlp output is matched without decoding each line;
+# only the whole percent is captured since that is all the page shows
+PROGRESS_RE = re.compile(rb"^\[download\]\s+(\d+)(?:\.\d+)?%")
+
+# Global status tracking, oldest first; finished downloads are swept
+# after a while and the oldest entries are evicted past the size cap
+MAX_TRACKED_DOWNLOADS = 512
+FINISHED_DOWNLOAD_TTL = 5 * 60
+download_status = OrderedDict()
+download_tasks = {}
+# Every status change is pushed to the queues of the streams and
+# long-polls following that download; download_id -> set of queues
+status_subscribers = {}
+status_lock = threading.Lock()
+STATUS_QUEUE_SIZE = 16
+STATUS_KEEPALIVE_INTERVAL = 15
+# Progress is published at most 4 times a second per download
+PROGRESS_UPDATE_INTERVAL = 0.25
+LONG_POLL_TIMEOUT = 25
+
+# Video info cache: video ID -> (fetched_at, info, formats_by_id), least
+# recently used first. Extracted YouTube stream URLs stay valid for about
+# 5 hours; past INFO_FRESH_TTL an entry is still served but refreshed in
+# the background
+INFO_CACHE_TTL = 5 * 60 * 60
+INFO_FRESH_TTL = 10 * 60
+MAX_CACHED_INFOS = 2000
+info_cache = OrderedDict()
+info_cache_lock = threading.Lock()
+info_refreshing = set()
+# Video ID -> Future of a fetch in progress, for callers to wait on
+info_fetches = {}
+INFO_HTTP_CACHE_CONTROL = "private, max-age=60, stale-while-revalidate=600"
+
+def is_valid_url(url):
+    """Check that a request's URL is safe to hand to yt-dlp"""
+    if not isinstance(url, str) or not URL_RE.match(url):
+        return False
+    scheme = URL_SCHEME_RE.match(url)
+    if scheme is not None and scheme.group(1).lower() not in ("http", "https"):
+        return False
+    return url_hostname(url) is not None
+
+def url_hostname(url):
+    """The lower-cased host of a URL (https:// assumed), "" if it has none, None if unparseable"""
+    if not URL_SCHEME_RE.match(url):
+        # "www.youtube.com/watch?v=..." parses as a path without a scheme
+        url = "https://" + url
+    try:
+        return (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        # e.g. "http://[abc" is rejected as an invalid IPv6 address
+        return None
+
+def youtube_video_id(url):
+    """The video ID of a YouTube link or bare ID, or None for anything else"""
+    if BARE_VIDEO_ID_RE.match(url):
+        return url
+    host = url_hostname(url)
+    if host is None:
+        return None
+    if host != "youtu.be" and host != "youtube.com" and not host.endswith(".youtube.com"):
+        return None
+    match = VIDEO_ID_RE.search(url)
+    return match.group(1) if match else None
+
+def info_cache_key(url):
+    """Cache key for a URL: its video ID, so every link form shares one entry"""
+    return youtube_video_id(url) or url
+
+def cache_info(url, info, fetched_at):
+    """Remember a video's info along with its formats indexed by format ID"""
+    formats_by_id = {fmt["format_id"]: fmt for fmt in info["formats"]}
+    key = info_cache_key(url)
+    with info_cache_lock:
+        info_cache[key] = (fetched_at, info, formats_by_id)
+        info_cache.move_to_end(key)
+        while len(info_cache) > MAX_CACHED_INFOS:
+            info_cache.popitem(last=False)
+
+def cached_info(url):
+    """Return the cache entry for a URL if it is still fresh, else None"""
+    key = info_cache_key(url)
+    with info_cache_lock:
+        entry = info_cache.get(key)
+        if entry is None or time.time() - entry[0] >= INFO_CACHE_TTL:
+            return None
+        info_cache.move_to_end(key)
+        return entry
+
+def set_download_status(download_id, status):
+    """Record a download's status, keeping download_status bounded"""
+    if status["status"] in ("completed", "error"):
+        status["finished_at"] = time.time()
+    with status_lock:
+        download_status[download_id] = status
+        download_status.move_to_end(download_id)
+        publish_status(download_id, status)
+        while len(download_status) > MAX_TRACKED_DOWNLOADS:
+            evicted_id, _ = download_status.popitem(last=False)
+            download_tasks.pop(evicted_id, None)
+            publish_status(evicted_id, {"status": "not_found"})
+
+def set_download_progress(download_id, progress):
+    """Update the progress of a running download"""
+    with status_lock:
+        status = download_status.get(download_id)
+        if status is not None:
+            status["progress"] = progress
+            publish_status(download_id, status)
+
+def forget_download(download_id):
+    """Drop everything tracked for a download"""
+    with status_lock:
+        download_status.pop(download_id, None)
+        download_tasks.pop(download_id, None)
+        publish_status(download_id, {"status": "not_found"})
+
+def publish_status(download_id, status):
+    """Push a status snapshot to everyone following the download; needs status_lock"""
+    for updates in status_subscribers.get(download_id, ()):
+        try:
+            updates.put_nowait(dict(status))
+        except queue.Full:
+            # A slow reader loses the oldest progress frame, never the latest state
+            updates.get_nowait()
+            updates.put_nowait(dict(status))
+
+def subscribe_status(download_id):
+    """Start following a download; returns its update queue and current status"""
+    updates = queue.Queue(maxsize=STATUS_QUEUE_SIZE)
+    with status_lock:
+        status_subscribers.setdefault(download_id, set()).add(updates)
+        status = dict(download_status.get(download_id, {"status": "not_found"}))
+    return updates, status
 
-# Global status tracking
-download_status = {}
+def unsubscribe_status(download_id, updates):
+    """Stop following a download"""
+    with status_lock:
+        subscribers = status_subscribers.get(download_id)
+        if subscribers is not None:
+            subscribers.discard(updates)
+            if not subscribers:
+                del status_subscribers[download_id]
+
+def write_file_atomic(path, data):
+    """Write a file through a temporary copy so readers never see it half-written"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def classify_format(vcodec, acodec):
+    """Return "audio" or "video" for a format, or None for storyboards etc."""
+    if vcodec == "none":
+        # Audio only, unless there is no audio either
+        return "audio" if acodec != "none" else None
+    # Video only or video with audio
+    return "video"
+
+def is_best_format(format_type, height, abr):
+    """Whether a format belongs under the page's "Best Quality" filter"""
+    if format_type == "video":
+        return (height or 0) >= BEST_VIDEO_HEIGHT
+    return (abr or 0) >= BEST_AUDIO_ABR
 
 class YouTubeDownloader:
     def __init__(self):
+        self.command_paths = {}
         self.setup_directories()
         self.check_dependencies()
+        
+        # Imported only now, so check_dependencies can install it first
+        import yt_dlp
+        self.yt_dlp = yt_dlp
+        self.download_env = self.yt_dlp_environment()
+        
+        # One long-lived extractor keeps yt-dlp imported and its HTTP
+        # connections alive between lookups; it is not thread-safe
+        self.ydl = yt_dlp.YoutubeDL({
+            "quiet": True,
+            "no_warnings": True,
+            "skip_download": True,
+            "noplaylist": True,
+            "socket_timeout": 30
+        })
+        self.ydl_lock = threading.Lock()
+        
+        # Downloads run as tasks on a single event loop in one background
+        # thread instead of one blocking thread per download
+        self.loop = asyncio.new_event_loop()
+        self.download_slots = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.loop.call_soon_threadsafe(self.sweep_download_status)
     
     def setup_directories(self):
         """Create necessary directories"""
-        DOWNLOAD_DIR.mkdir(exist_ok=True)
-        AUDIO_DIR.mkdir(exist_ok=True)
-        VIDEO_DIR.mkdir(exist_ok=True)
+        # parents=True creates DOWNLOAD_DIR along the way; once everything
+        # exists a start costs one stat per folder and no mkdir calls
+        for directory in (AUDIO_DIR, VIDEO_DIR, META_CACHE_DIR):
+            if not directory.is_dir():
+                directory.mkdir(parents=True, exist_ok=True)
         print(f"✓ Directories created: {DOWNLOAD_DIR}")
     
     def check_dependencies(self):
         """Check and install required dependencies"""
         print("Checking dependencies...")
+        self.load_command_paths()
+        remembered = dict(self.command_paths) or None
         
-        # Check yt-dlp
-        if not self.command_exists("yt-dlp"):
+        # Check yt-dlp; the app imports it and runs downloads with
+        # "python -m yt_dlp", so the command on PATH is not enough
+        if importlib.util.find_spec("yt_dlp") is None:
             print("Installing yt-dlp...")
             subprocess.run([sys.executable, "-m", "pip", "install", "yt-dlp"], check=True)
+            importlib.invalidate_caches()
         
         # Check ffmpeg
         if not self.command_exists("ffmpeg"):
             print("⚠️  ffmpeg not found. Some formats may not work properly.")
             print("Please install ffmpeg manually for full functionality.")
         
+        if self.command_paths != remembered:
+            self.save_command_paths()
         print("✓ Dependencies checked")
     
+    def yt_dlp_environment(self):
+        """Environment for download processes, able to import the same yt-dlp as the app"""
+        env = dict(os.environ)
+        package_dir = os.path.dirname(os.path.dirname(self.yt_dlp.__file__))
+        site_dirs = {os.path.normcase(d) for d in (*site.getsitepackages(), site.getusersitepackages())}
+        # Outside the usual site-packages (e.g. unpacked from a shiv bundle)
+        # a fresh interpreter would not find it on its own
+        if os.path.normcase(package_dir) not in site_dirs:
+            env["PYTHONPATH"] = os.pathsep.join(filter(None, (package_dir, env.get("PYTHONPATH"))))
+        return env
+    
+    def command_paths_environment(self):
+        """What the remembered locations depend on: the interpreter and PATH"""
+        return {"python": sys.executable, "path": os.environ.get("PATH", "")}
+    
+    def load_command_paths(self):
+        """Load command locations remembered from a previous start in this environment"""
+        self.command_paths = {}
+        try:
+            cache = json.loads(DEPS_CACHE_FILE.read_text())
+        except (OSError, ValueError):
+            return
+        # Another virtualenv or PATH may resolve the commands differently
+        if isinstance(cache, dict) and cache.get("environment") == self.command_paths_environment():
+            self.command_paths = cache.get("commands", {})
+    
+    def save_command_paths(self):
+        """Remember command locations so the next start can skip the PATH search"""
+        cache = {"environment": self.command_paths_environment(), "commands": self.command_paths}
+        try:
+            DEPS_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            write_file_atomic(DEPS_CACHE_FILE, json.dumps(cache).encode("utf-8"))
+        except OSError:
+            pass
+    
+    def find_command(self, command):
+        """Locate a command, trusting a remembered location while it still exists"""
+        path = self.command_paths.get(command)
+        if path and os.path.exists(path):
+            return path
+        
+        path = shutil.which(command)
+        if path:
+            self.command_paths[command] = path
+        else:
+            self.command_paths.pop(command, None)
+        return path
+    
     def command_exists(self, command):
         """Check if a command exists in PATH"""
-        return shutil.which(command) is not None
+        return self.find_command(command) is not None
     
-    def get_video_info(self, url):
-        """Get video information and available formats"""
+    def meta_cache_file(self, url, suffix=".json"):
+        """Disk cache path for a YouTube video's metadata, keyed by video ID"""
+        video_id = youtube_video_id(url)
+        return META_CACHE_DIR / f"{video_id}{suffix}" if video_id else None
+    
+    def is_cache_fresh(self, path):
+        """Check if a disk cache file exists and is younger than META_CACHE_TTL"""
         try:
-            cmd = [
-                "yt-dlp",
-                "--dump-json",
-                "--no-download",
-                url
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            
-            if result.returncode != 0:
-                return {"error": f"Failed to fetch video info: {result.stderr}"}
-            
-            video_info = json.loads(result.stdout)
+            return time.time() - path.stat().st_mtime < META_CACHE_TTL
+        except OSError:
+            return False
+    
+    def get_video_info(self, url, refresh=False):
+        """Get video information and available formats; refresh skips the caches"""
+        cached = None if refresh else cached_info(url)
+        if cached:
+            if time.time() - cached[0] >= INFO_FRESH_TTL:
+                self.refresh_video_info(url)
+            return cached[1]
+        
+        cache_file = self.meta_cache_file(url)
+        if cache_file and not refresh and self.is_cache_fresh(cache_file):
+            try:
+                info = json_loads(cache_file.read_bytes())
+                cache_info(url, info, cache_file.stat().st_mtime)
+                return info
+            except (OSError, ValueError):
+                pass
+        
+        # Single flight: concurrent lookups of one video share a single fetch
+        key = info_cache_key(url)
+        with info_cache_lock:
+            pending = info_fetches.get(key)
+            leader = pending is None
+            if leader:
+                pending = info_fetches[key] = Future()
+        if not leader:
+            return pending.result()
+        
+        try:
+            info = self.fetch_video_info(url, cache_file)
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        else:
+            pending.set_result(info)
+        finally:
+            with info_cache_lock:
+                info_fetches.pop(key, None)
+        return info
+    
+    def fetch_video_info(self, url, cache_file):
+        """Extract a video's info with yt-dlp and cache it"""
+        try:
+            with self.ydl_lock:
+                video_info = self.ydl.extract_info(url, download=False)
             
             # Extract relevant information
             formats = []
-            for fmt in video_info.get("formats", []):
-                if fmt.get("vcodec") == "none" and fmt.get("acodec") != "none":
-                    # Audio only
-                    format_type = "audio"
-                elif fmt.get("acodec") == "none" and fmt.get("vcodec") != "none":
-                    # Video only
-                    format_type = "video"
-                elif fmt.get("vcodec") != "none" and fmt.get("acodec") != "none":
-                    # Video with audio
-                    format_type = "video"
-                else:
+            for fmt in video_info.get("formats", ()):
+                get = fmt.get
+                format_type = classify_format(get("vcodec"), get("acodec"))
+                if format_type is None:
                     continue
                 
-                format_info = {
-                    "format_id": fmt.get("format_id"),
-                    "ext": fmt.get("ext"),
-                    "quality": fmt.get("format_note", "Unknown"),
-                    "filesize": fmt.get("filesize"),
+                formats.append({
+                    "format_id": get("format_id"),
+                    "ext": get("ext"),
+                    "quality": get("format_note", "Unknown"),
+                    "filesize": get("filesize"),
                     "type": format_type,
-                    "resolution": fmt.get("resolution"),
-                    "fps": fmt.get("fps"),
-                    "abr": fmt.get("abr"),
-                    "vbr": fmt.get("vbr")
-                }
-                
-                formats.append(format_info)
+                    "is_best": is_best_format(format_type, get("height"), get("abr")),
+                    "resolution": get("resolution"),
+                    "fps": get("fps"),
+                    "abr": get("abr"),
+                    "vbr": get("vbr")
+                })
             
-            return {
+            info = {
                 "title": video_info.get("title"),
                 "duration": video_info.get("duration"),
                 "uploader": video_info.get("uploader"),
                 "formats": formats
             }
+            cache_info(url, info, time.time())
             
-        except subprocess.TimeoutExpired:
-            return {"error": "Request timed out"}
+            if cache_file:
+                try:
+                    write_file_atomic(cache_file, json_dumps(info))
+                    # Raw info lets downloads skip yt-dlp's own extraction
+                    raw_info = json_dumps(self.ydl.sanitize_info(video_info))
+                    write_file_atomic(self.meta_cache_file(url, ".info.json"), raw_info)
+                except (OSError, TypeError, ValueError):
+                    # orjson rejects some values json accepts (e.g. non-str
+                    # keys, huge ints); the lookup itself still succeeded
+                    pass
+            return info
+            
+        except self.yt_dlp.utils.DownloadError as e:
+            return {"error": f"Failed to fetch video info: {e}"}
         except Exception as e:
             return {"error": str(e)}
     
-    def download_video(self, url, format_id, download_id, convert_to_mp3=False):
-        try:
-            download_status[download_id] = {"status": "starting", "progress": 0}
-            
-            # Determine output directory based on format
-            info = self.get_video_info(url)
-            if "error" in info:
-                download_status[download_id] = {"status": "error", "message": info["error"]}
+    def refresh_video_info(self, url):
+        """Re-fetch a video's info in a background thread, once at a time per video"""
+        key = info_cache_key(url)
+        with info_cache_lock:
+            if key in info_refreshing:
                 return
+            info_refreshing.add(key)
+        
+        def refresh():
+            try:
+                # A failed fetch is not cached, so the stale entry stays in use
+                self.get_video_info(url, refresh=True)
+            finally:
+                with info_cache_lock:
+                    info_refreshing.discard(key)
+        
+        threading.Thread(target=refresh, daemon=True).start()
+    
+    def get_video_info_batch(self, urls):
+        """Get info for several videos in one go"""
+        # The shared extractor reuses its HTTPS connections across all of them
+        return [self.get_video_info(url) for url in urls]
+    
+    def sweep_download_status(self):
+        """Forget finished downloads and expired video info; reschedules itself every minute"""
+        now = time.time()
+        cutoff = now - FINISHED_DOWNLOAD_TTL
+        with status_lock:
+            finished = [download_id for download_id, status in download_status.items()
+                        if status.get("finished_at", cutoff) < cutoff]
+        # forget_download also drops the task and ends any stream still open
+        for download_id in finished:
+            forget_download(download_id)
+        
+        with info_cache_lock:
+            expired = [key for key, entry in info_cache.items()
+                       if now - entry[0] >= INFO_CACHE_TTL]
+            for key in expired:
+                del info_cache[key]
+        
+        self.loop.run_in_executor(None, self.sweep_meta_cache)
+        self.loop.call_later(60, self.sweep_download_status)
+    
+    def sweep_meta_cache(self):
+        """Delete disk cache files too old to be used again"""
+        cutoff = time.time() - META_CACHE_TTL - META_CACHE_SWEEP_GRACE
+        try:
+            with os.scandir(META_CACHE_DIR) as entries:
+                for entry in entries:
+                    try:
+                        if entry.stat().st_mtime < cutoff:
+                            os.remove(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    
+    def start_download(self, url, format_id, download_id, convert_to_mp3=False, is_audio=None):
+        """Schedule a download on the background event loop"""
+        # Record the download right away so status streams opened as soon
+        # as this returns don't see it as unknown
+        set_download_status(download_id, {"status": "starting", "progress": 0})
+        download_tasks[download_id] = asyncio.run_coroutine_threadsafe(
+            self.run_when_slot_free(
+                download_id,
+                self.download_video(url, format_id, download_id, convert_to_mp3, is_audio)
+            ),
+            self.loop
+        )
+    
+    async def run_when_slot_free(self, download_id, download):
+        """Run a download once fewer than MAX_CONCURRENT_DOWNLOADS are running"""
+        if self.download_slots.locked():
+            set_download_status(download_id, {"status": "queued", "progress": 0})
+        async with self.download_slots:
+            await download
+    
+    async def download_video(self, url, format_id, download_id, convert_to_mp3=False, is_audio=None):
+        try:
+            set_download_status(download_id, {"status": "starting", "progress": 0})
             
-            format_info = next((f for f in info["formats"] if f["format_id"] == format_id), None)
-            if not format_info:
-                download_status[download_id] = {"status": "error", "message": "Format not found"}
-                return
+            # Determine output directory based on format; the client usually
+            # tells us, otherwise the (normally cached) video info does
+            if is_audio is None:
+                loop = asyncio.get_running_loop()
+                info = await loop.run_in_executor(None, self.get_video_info, url)
+                if "error" in info:
+                    set_download_status(download_id, {"status": "error", "message": info["error"]})
+                    return
+                
+                # A successful lookup always leaves the video in info_cache
+                cached = cached_info(url)
+                format_info = cached[2].get(format_id) if cached else None
+                if not format_info:
+                    set_download_status(download_id, {"status": "error", "message": "Format not found"})
+                    return
+                
+                is_audio = format_info["type"] == "audio"
             
-            is_audio = format_info["type"] == "audio"
             output_dir = AUDIO_DIR if is_audio else VIDEO_DIR
             
+            info_json = self.meta_cache_file(url, ".info.json")
+            if info_json and self.is_cache_fresh(info_json):
+                source = ["--load-info-json", str(info_json)]
+            else:
+                source = [url]
+            
             # --- START OF MODIFICATION ---
 
             if is_audio and convert_to_mp3:
@@ -140,81 +578,101 @@ class YouTubeDownloader:
                 filename_template = "%(title)s.%(ext)s"
                 output_path = str(output_dir / filename_template)
                 cmd = [
-                    "yt-dlp",
+                    sys.executable, "-m", "yt_dlp",
                     "-f", format_id,
                     "-o", output_path,
                     "--no-playlist",
+                    "--newline",
+                    *DOWNLOAD_TUNING_ARGS,
                     "--extract-audio",      # Extract audio stream
                     "--audio-format", "mp3",# Convert to mp3
                     "--audio-quality", "0",  # Best audio quality
-                    url
+                    *source
                 ]
-                download_status[download_id] = {"status": "converting to MP3", "progress": 0}
+                set_download_status(download_id, {"status": "converting to MP3", "progress": 0})
             else:
                 # Original download command
                 filename_template = "%(title)s.%(ext)s"
                 output_path = str(output_dir / filename_template)
                 cmd = [
-                    "yt-dlp",
+                    sys.executable, "-m", "yt_dlp",
                     "-f", format_id,
                     "-o", output_path,
                     "--no-playlist",
-                    url
+                    "--newline",
+                    *DOWNLOAD_TUNING_ARGS,
+                    *source
                 ]
-                download_status[download_id] = {"status": "downloading", "progress": 0}
+                set_download_status(download_id, {"status": "downloading", "progress": 0})
             
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                universal_newlines=True
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                env=self.download_env
             )
             
-            # Monitor progress
-            for line in process.stdout:
-                if "[download]" in line and "%" in line:
-                    try:
-                        # Extract percentage
-                        parts = line.split()
-                        for part in parts:
-                            if "%" in part:
-                                percent = float(part.replace("%", ""))
-                                download_status[download_id]["progress"] = percent
-                                break
-                    except:
-                        pass
+            # Monitor progress, storing it only when the whole percent changes
+            # and at most PROGRESS_UPDATE_INTERVAL apart; yt-dlp prints many
+            # lines per second on fast connections. 100% always gets through,
+            # and a change held back by the interval is stored once it ends.
+            last_progress = 0
+            pending = None
+            last_update = 0.0
+            trailing = None
+            
+            def flush_progress():
+                nonlocal last_progress, pending, last_update, trailing
+                trailing = None
+                if pending is not None:
+                    set_download_progress(download_id, pending)
+                    last_progress, pending, last_update = pending, None, time.monotonic()
+            
+            try:
+                async for line in process.stdout:
+                    match = PROGRESS_RE.match(line)
+                    if match:
+                        progress = int(match.group(1))
+                        if progress == (last_progress if pending is None else pending):
+                            continue
+                        pending = progress
+                        wait = last_update + PROGRESS_UPDATE_INTERVAL - time.monotonic()
+                        if progress == 100 or wait <= 0:
+                            if trailing is not None:
+                                trailing.cancel()
+                            flush_progress()
+                        elif trailing is None:
+                            trailing = self.loop.call_later(wait, flush_progress)
+            finally:
+                # The final status replaces whatever progress is still pending
+                if trailing is not None:
+                    trailing.cancel()
             
-            process.wait()
+            await process.wait()
             
             if process.returncode == 0:
-                download_status[download_id] = {"status": "completed", "progress": 100}
+                set_download_status(download_id, {"status": "completed", "progress": 100})
             else:
-                download_status[download_id] = {"status": "error", "message": "Download failed"}
+                set_download_status(download_id, {"status": "error", "message": "Download failed"})
                 
         except Exception as e:
-            download_status[download_id] = {"status": "error", "message": str(e)}
+            set_download_status(download_id, {"status": "error", "message": str(e)})
     
     def update_yt_dlp(self):
         """Update yt-dlp to latest version"""
         try:
             subprocess.run([sys.executable, "-m", "pip", "install", "--upgrade", "yt-dlp"], check=True)
-            return {"success": True, "message": "yt-dlp updated successfully"}
+            # Downloads run the new yt-dlp right away; format lookups use the
+            # copy already imported by this process
+            return {"success": True, "message": "yt-dlp updated successfully. Restart the app to use it for format lookups."}
         except Exception as e:
             return {"success": False, "message": str(e)}
 
 # Initialize downloader
 downloader = YouTubeDownloader()
 
-# HTML Template
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>YouTube Downloader</title>
-    <style>
+# Stylesheet, served as its own file so browsers keep it between visits
+APP_CSS = """
         :root {
             --bg-primary: #ffffff;
             --bg-secondary: #f8f9fa;
@@ -475,6 +933,13 @@ HTML_TEMPLATE = """
             border-color: var(--accent-color);
         }
         
+        /* The format filter is a class on the grid, so switching it is one write */
+        .filter-audio .format-item:not(.is-audio),
+        .filter-video .format-item:not(.is-video),
+        .filter-best .format-item:not(.is-best) {
+            display: none;
+        }
+        
         .format-info {
             flex: 1;
         }
@@ -669,7 +1134,17 @@ HTML_TEMPLATE = """
                 height: 40px;
             }
         }
-    </style>
+"""
+
+# HTML Template
+HTML_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>YouTube Downloader</title>
+    <link rel="stylesheet" href="/static/app.css?v=__CSS_VERSION__">
 </head>
 <body>
     <div class="container">
@@ -689,6 +1164,10 @@ HTML_TEMPLATE = """
                         <span>🔍</span>
                         Get Formats
                     </button>
+                    <button class="btn-secondary" onclick="fetchFormats(true)" title="Fetch the formats again instead of using cached ones">
+                        <span>♻️</span>
+                        Refresh
+                    </button>
                     <button class="btn-secondary" onclick="updateYtDlp()">
                         <span>🔄</span>
                         Update yt-dlp
@@ -733,7 +1212,8 @@ HTML_TEMPLATE = """
 
     <script>
         let currentVideoData = null;
-        let downloadInterval = null;
+        let downloadStream = null;
+        let monitoredDownload = null;
         let currentTheme = localStorage.getItem('theme') || 'light';
         
         // Initialize theme on page load
@@ -791,7 +1271,7 @@ HTML_TEMPLATE = """
             document.getElementById('loadingSection').classList.add('hidden');
         }
         
-        async function fetchFormats() {
+        async function fetchFormats(refresh = false) {
             const url = document.getElementById('urlInput').value.trim();
             if (!url) {
                 showStatus('Please enter a YouTube URL', 'error');
@@ -801,10 +1281,10 @@ HTML_TEMPLATE = """
             showLoading();
             
             try {
-                const response = await fetch('/api/info', {
-                    method: 'POST',
-                    headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({url: url})
+                // GET so the browser can cache the answer; a refresh
+                // bypasses that cache and tells the server to skip its own
+                const response = await fetch(`/api/info?url=${encodeURIComponent(url)}`, {
+                    cache: refresh ? 'reload' : 'default'
                 });
                 
                 const data = await response.json();
@@ -836,17 +1316,18 @@ HTML_TEMPLATE = """
         
         function displayFormats(formats) {
             const container = document.getElementById('formatsContainer');
-            container.innerHTML = '';
+            const fragment = document.createDocumentFragment();
             
             formats.forEach(format => {
-                const formatElement = createFormatElement(format);
-                container.appendChild(formatElement);
+                fragment.appendChild(createFormatElement(format));
             });
+            container.replaceChildren(fragment);
         }
         
         function createFormatElement(format) {
             const div = document.createElement('div');
-            div.className = 'format-item';
+            // The server classifies formats; filterFormats only switches the grid's class
+            div.className = `format-item is-${format.type}` + (format.is_best ? ' is-best' : '');
             div.setAttribute('data-type', format.type);
             
             const quality = format.resolution || format.quality || 'Unknown';
@@ -889,6 +1370,7 @@ HTML_TEMPLATE = """
         async function downloadFormat(formatId, convertToMp3 = false) {
             const url = document.getElementById('urlInput').value.trim();
             const downloadId = Date.now().toString();
+            const format = currentVideoData && currentVideoData.formats.find(f => f.format_id === formatId);
             
             showStatus('Starting download...', 'info');
             
@@ -900,7 +1382,8 @@ HTML_TEMPLATE = """
                         url: url,
                         format_id: formatId,
                         download_id: downloadId,
-                        convert_to_mp3: convertToMp3
+                        convert_to_mp3: convertToMp3,
+                        is_audio: format ? format.type === 'audio' : undefined
                     })
                 });
                 
@@ -915,59 +1398,80 @@ HTML_TEMPLATE = """
             }
         }
         
+        // Shows a download status; returns true once the download is over
+        function showDownloadStatus(status) {
+            if (status.status === 'downloading' || status.status === 'converting to MP3') {
+                const progress = status.progress || 0;
+                showStatus(`Downloading... ${Math.round(progress)}%`, 'downloading', progress);
+                return false;
+            } else if (status.status === 'queued') {
+                showStatus('Waiting for other downloads to finish...', 'info');
+                return false;
+            } else if (status.status === 'completed') {
+                showStatus('Download completed successfully! 🎉', 'success');
+            } else if (status.status === 'error') {
+                showStatus('Download failed: ' + status.message, 'error');
+            } else if (status.status === 'not_found') {
+                showStatus('Download not found', 'error');
+            } else {
+                return false;
+            }
+            return true;
+        }
+        
         function monitorDownload(downloadId) {
-            if (downloadInterval) {
-                clearInterval(downloadInterval);
+            if (downloadStream) {
+                downloadStream.close();
+                downloadStream = null;
+            }
+            monitoredDownload = downloadId;
+            
+            if (!window.EventSource) {
+                pollDownload(downloadId);
+                return;
             }
             
-            downloadInterval = setInterval(async () => {
+            // The server pushes a message whenever the status changes
+            downloadStream = new EventSource(`/api/progress/${downloadId}`);
+            
+            downloadStream.onmessage = (event) => {
+                if (showDownloadStatus(JSON.parse(event.data))) {
+                    downloadStream.close();
+                }
+            };
+            
+            downloadStream.onerror = () => {
+                // Streams can be cut by proxies; keep following with long-polling
+                downloadStream.close();
+                downloadStream = null;
+                pollDownload(downloadId);
+            };
+        }
+        
+        // Long-polling fallback: the server holds each request until the
+        // status moves past what we last saw, or its timeout runs out
+        async function pollDownload(downloadId, since = -1, state = '') {
+            while (monitoredDownload === downloadId) {
+                let status;
                 try {
-                    const response = await fetch(`/api/status/${downloadId}`);
-                    const status = await response.json();
-                    
-                    if (status.status === 'downloading' || status.status === 'converting to MP3') {
-                        const progress = status.progress || 0;
-                        showStatus(`Downloading... ${Math.round(progress)}%`, 'downloading', progress);
-                    } else if (status.status === 'completed') {
-                        showStatus('Download completed successfully! 🎉', 'success');
-                        clearInterval(downloadInterval);
-                    } else if (status.status === 'error') {
-                        showStatus('Download failed: ' + status.message, 'error');
-                        clearInterval(downloadInterval);
-                    }
-                    
+                    const response = await fetch(`/api/status/${downloadId}?since=${since}&status=${encodeURIComponent(state)}`);
+                    status = await response.json();
                 } catch (error) {
-                    clearInterval(downloadInterval);
                     showStatus('Download monitoring error', 'error');
+                    return;
                 }
-            }, 1000);
+                if (monitoredDownload !== downloadId || showDownloadStatus(status)) {
+                    return;
+                }
+                since = status.progress || 0;
+                state = status.status;
+            }
         }
         
         function filterFormats() {
             const filter = document.getElementById('formatFilter').value;
-            const formatItems = document.querySelectorAll('.format-item');
-            
-            formatItems.forEach(item => {
-                const type = item.getAttribute('data-type');
-                
-                if (filter === 'all') {
-                    item.style.display = 'flex';
-                } else if (filter === 'best') {
-                    // Show only high quality formats
-                    const quality = item.textContent.toLowerCase();
-                    if (quality.includes('1080p') || quality.includes('720p') || 
-                        quality.includes('best') || quality.includes('320') || 
-                        quality.includes('256')) {
-                        item.style.display = 'flex';
-                    } else {
-                        item.style.display = 'none';
-                    }
-                } else if (filter === type) {
-                    item.style.display = 'flex';
-                } else {
-                    item.style.display = 'none';
-                }
-            });
+            // The stylesheet hides the items that don't match the filter
+            document.getElementById('formatsContainer').className = `formats-grid filter-${filter}`;
         }
         
         async function updateYtDlp() {
@@ -978,7 +1482,7 @@ HTML_TEMPLATE = """
                 const data = await response.json();
                 
                 if (data.success) {
-                    showStatus('yt-dlp updated successfully! ✅', 'success');
+                    showStatus(data.message + ' ✅', 'success');
                 } else {
                     showStatus('Update failed: ' + data.message, 'error');
                 }
@@ -1013,20 +1517,112 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# The stylesheet URL carries a content hash, so it can be cached forever
+# and a changed stylesheet is fetched under a new URL
+APP_CSS_BYTES = APP_CSS.encode("utf-8")
+APP_CSS_GZ = gzip.compress(APP_CSS_BYTES, 9)
+APP_CSS_ETAG = hashlib.md5(APP_CSS_BYTES).hexdigest()
+
+# The page has no template variables, so it is encoded and compressed once
+# instead of going through Jinja on every request
+INDEX_HTML = HTML_TEMPLATE.replace("__CSS_VERSION__", APP_CSS_ETAG[:12]).encode("utf-8")
+INDEX_HTML_GZ = gzip.compress(INDEX_HTML, 9)
+INDEX_HTML_ETAG = hashlib.md5(INDEX_HTML).hexdigest()
+
+def accepts_gzip():
+    """Whether the client takes gzip; "gzip;q=0" means it refuses it"""
+    return request.accept_encodings['gzip'] > 0
+
+def encoding_etag(etag, gzipped):
+    """The gzip and plain bodies are different bytes, so they get different ETags"""
+    return f"{etag}-gzip" if gzipped else etag
+
+def precompressed_response(body, body_gz, mimetype, etag):
+    """Respond with the gzipped copy of a static body when the client accepts it"""
+    gzipped = accepts_gzip()
+    if gzipped:
+        response = Response(body_gz, mimetype=mimetype)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(body, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    response.set_etag(encoding_etag(etag, gzipped))
+    return response
+
+def should_compress_json(body):
+    """Whether compress_json will gzip this JSON body for the current client"""
+    return len(body) >= MIN_COMPRESS_SIZE and accepts_gzip()
+
+@app.after_request
+def compress_json(response):
+    """Gzip JSON answers big enough to be worth it, such as format lists"""
+    if (response.mimetype != 'application/json'
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if should_compress_json(body):
+        # Level 6 is most of level 9's savings for a fraction of the time
+        response.set_data(gzip.compress(body, 6))
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    response = precompressed_response(INDEX_HTML, INDEX_HTML_GZ, 'text/html', INDEX_HTML_ETAG)
+    # Browsers keep the page but check back each time, so a new version of
+    # the app is picked up at once; an unchanged page costs an empty 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/static/app.css')
+def app_css():
+    response = precompressed_response(APP_CSS_BYTES, APP_CSS_GZ, 'text/css', APP_CSS_ETAG)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response.make_conditional(request)
 
-@app.route('/api/info', methods=['POST'])
+@app.route('/api/info', methods=['GET', 'POST'])
 def get_video_info():
-    data = request.get_json()
-    url = data.get('url')
+    if request.method == 'GET':
+        url = request.args.get('url')
+    else:
+        data = request.get_json()
+        url = data.get('url')
     
     if not url:
         return jsonify({"error": "URL is required"}), 400
+    if not is_valid_url(url):
+        return jsonify({"error": "Invalid URL"}), 400
     
-    info = downloader.get_video_info(url)
-    return jsonify(info)
+    # A browser reload of the request (fetch's cache: 'reload') asks for fresh data too
+    refresh = request.args.get('refresh') == '1' or request.cache_control.no_cache
+    info = downloader.get_video_info(url, refresh=refresh)
+    response = jsonify(info)
+    if request.method == 'GET' and "error" not in info:
+        # Let the browser reuse or revalidate the answer instead of asking again;
+        # the ETag names the encoding compress_json is about to apply
+        body = response.get_data()
+        response.set_etag(encoding_etag(hashlib.md5(body).hexdigest(), should_compress_json(body)))
+        response.headers['Cache-Control'] = INFO_HTTP_CACHE_CONTROL
+        response = response.make_conditional(request)
+    return response
+
+@app.route('/api/info/batch', methods=['POST'])
+def get_video_info_batch():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "A JSON object is required"}), 400
+    urls = data.get('urls')
+    
+    if not isinstance(urls, list) or not urls:
+        return jsonify({"error": "A list of URLs is required"}), 400
+    if len(urls) > MAX_BATCH_URLS:
+        return jsonify({"error": f"At most {MAX_BATCH_URLS} URLs per request"}), 400
+    if not all(is_valid_url(url) for url in urls):
+        return jsonify({"error": "Invalid URL"}), 400
+    
+    return jsonify({"results": downloader.get_video_info_batch(urls)})
 
 @app.route('/api/download', methods=['POST'])
 def download_video():
@@ -1035,34 +1631,83 @@ def download_video():
     format_id = data.get('format_id')
     download_id = data.get('download_id')
     convert_to_mp3 = data.get('convert_to_mp3', False)
+    is_audio = data.get('is_audio')
+    if not isinstance(is_audio, bool):
+        # Anything but a real boolean is ignored; the cached format info decides
+        is_audio = None
     
     if not all([url, format_id, download_id]):
         return jsonify({"error": "Missing required parameters"}), 400
+    if not is_valid_url(url):
+        return jsonify({"error": "Invalid URL"}), 400
     
-    # Start download in background thread
-    thread = threading.Thread(
-        target=downloader.download_video,
-        args=(url, format_id, download_id, convert_to_mp3)
-    )
-    thread.daemon = True
-    thread.start()
+    # Start download on the background event loop
+    downloader.start_download(url, format_id, download_id, convert_to_mp3, is_audio)
     
     return jsonify({"success": True})
 
 @app.route('/api/status/<download_id>')
 def get_download_status(download_id):
-    status = download_status.get(download_id, {"status": "not_found"})
+    """Current status; with ?since=<progress> it waits until the status moves on"""
+    since = request.args.get('since', type=int)
+    seen_status = request.args.get('status')
+    if since is None:
+        with status_lock:
+            status = dict(download_status.get(download_id, {"status": "not_found"}))
+        return jsonify(status)
+    
+    def changed(status):
+        return (status["status"] == "not_found"
+                or status.get("progress", 0) != since
+                or (seen_status and status["status"] != seen_status))
+    
+    updates, status = subscribe_status(download_id)
+    try:
+        deadline = time.monotonic() + LONG_POLL_TIMEOUT
+        while not changed(status):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                status = updates.get(timeout=remaining)
+            except queue.Empty:
+                break
+    finally:
+        unsubscribe_status(download_id, updates)
     return jsonify(status)
 
+@app.route('/api/progress/<download_id>')
+def stream_download_progress(download_id):
+    """Server-Sent Events stream that pushes the download status when it changes"""
+    def generate():
+        updates, status = subscribe_status(download_id)
+        try:
+            yield f"data: {json.dumps(status)}\n\n"
+            while status["status"] not in ("completed", "error", "not_found"):
+                try:
+                    status = updates.get(timeout=STATUS_KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    # Nothing new; a comment line lets a closed connection surface
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {json.dumps(status)}\n\n"
+        finally:
+            unsubscribe_status(download_id, updates)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
 @app.route('/api/update', methods=['POST'])
 def update_yt_dlp():
     result = downloader.update_yt_dlp()
     return jsonify(result)
 
-if __name__ == '__main__':
+def main():
     print("🎥 YouTube Downloader Starting...")
     print(f"📁 Download directory: {DOWNLOAD_DIR}")
     print("🌐 Open http://localhost:5000 in your browser")
     print("Press Ctrl+C to stop")
     
-    app.run(debug=False, host='localhost', port=5000)
\ No newline at end of file
+    app.run(debug=False, host='localhost', port=5000)
+
+if __name__ == '__main__':
+    main()